@@ -4,12 +4,17 @@ This code should be moved to langchain proper or removed entirely.
 """
 
 import logging
-from typing import List, Union
+from typing import List, Optional, Union
 
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+try:
+    import simsimd as simd  # type: ignore
+except ImportError:
+    simd = None  # type: ignore[assignment]
+
 Matrix = Union[List[List[float]], List[np.ndarray], np.ndarray]
 
 
@@ -18,21 +23,19 @@ def cosine_similarity(X: Matrix, Y: Matrix) -> np.ndarray:
     if len(X) == 0 or len(Y) == 0:
         return np.array([])
 
-    X = np.array(X)
-    Y = np.array(Y)
+    X = np.asarray(X)
+    Y = np.asarray(Y)
     if X.shape[1] != Y.shape[1]:
         raise ValueError(
             f"Number of columns in X and Y must be the same. X has shape {X.shape} "
             f"and Y has shape {Y.shape}."
         )
-    try:
-        import simsimd as simd  # type: ignore
-
-        X = np.array(X, dtype=np.float32)
-        Y = np.array(Y, dtype=np.float32)
+    if simd is not None:
+        X = np.asarray(X, dtype=np.float32)
+        Y = np.asarray(Y, dtype=np.float32)
         Z = 1 - np.array(simd.cdist(X, Y, metric="cosine"))
         return Z
-    except ImportError:
+    else:
         logger.debug(
             "Unable to import simsimd, defaulting to NumPy implementation. If you want "
             "to use simsimd please install with `pip install simsimd`."
@@ -51,30 +54,38 @@ def maximal_marginal_relevance(
     embedding_list: list,
     lambda_mult: float = 0.5,
     k: int = 4,
+    similarity_to_query: Optional[np.ndarray] = None,
 ) -> List[int]:
-    """Calculate maximal marginal relevance."""
+    """Calculate maximal marginal relevance.
+
+    ``similarity_to_query`` may hold precomputed cosine similarities between the
+    query and each embedding in ``embedding_list`` (e.g. as already computed by
+    the database), in which case they are not computed again.
+    """
     if min(k, len(embedding_list)) <= 0:
         return []
-    if query_embedding.ndim == 1:
-        query_embedding = np.expand_dims(query_embedding, axis=0)
-    similarity_to_query = cosine_similarity(query_embedding, embedding_list)[0]
+    embeddings = np.asarray(embedding_list)
+    if similarity_to_query is None:
+        if query_embedding.ndim == 1:
+            query_embedding = np.expand_dims(query_embedding, axis=0)
+        similarity_to_query = cosine_similarity(query_embedding, embeddings)[0]
     most_similar = int(np.argmax(similarity_to_query))
     idxs = [most_similar]
-    selected = np.array([embedding_list[most_similar]])
-    while len(idxs) < min(k, len(embedding_list)):
-        best_score = -np.inf
-        idx_to_add = -1
-        similarity_to_selected = cosine_similarity(embedding_list, selected)
-        for i, query_score in enumerate(similarity_to_query):
-            if i in idxs:
-                continue
-            redundant_score = max(similarity_to_selected[i])
-            equation_score = (
-                lambda_mult * query_score - (1 - lambda_mult) * redundant_score
-            )
-            if equation_score > best_score:
-                best_score = equation_score
-                idx_to_add = i
+    # Track each candidate's highest similarity to the selected set, so every
+    # round only compares the candidates against the newly selected embedding.
+    max_similarity_to_selected = cosine_similarity(
+        embeddings, embeddings[[most_similar]]
+    )[:, 0]
+    while len(idxs) < min(k, len(embeddings)):
+        equation_scores = (
+            lambda_mult * similarity_to_query
+            - (1 - lambda_mult) * max_similarity_to_selected
+        )
+        equation_scores[idxs] = -np.inf
+        idx_to_add = int(np.argmax(equation_scores))
         idxs.append(idx_to_add)
-        selected = np.append(selected, [embedding_list[idx_to_add]], axis=0)
+        max_similarity_to_selected = np.maximum(
+            max_similarity_to_selected,
+            cosine_similarity(embeddings, embeddings[[idx_to_add]])[:, 0],
+        )
     return idxs
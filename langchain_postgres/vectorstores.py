@@ -1,22 +1,27 @@
 # pylint: disable=too-many-lines
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import enum
 import logging
 import uuid
+from itertools import islice, repeat
 from typing import (
     Any,
     AsyncGenerator,
+    AsyncIterator,
     Callable,
     Dict,
     Generator,
     Iterable,
+    Iterator,
     List,
     Optional,
     Sequence,
     Tuple,
     Type,
+    TypeVar,
     Union,
 )
 from typing import (
@@ -30,7 +35,7 @@ from langchain_core.embeddings import Embeddings
 from langchain_core.utils import get_from_dict_or_env
 from langchain_core.vectorstores import VectorStore
 from sqlalchemy import SQLColumnExpression, cast, create_engine, delete, func, select
-from sqlalchemy.dialects.postgresql import JSON, JSONB, JSONPATH, UUID, insert
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, JSONB, JSONPATH, UUID, insert
 from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -59,6 +64,13 @@ class DistanceStrategy(str, enum.Enum):
 
 DEFAULT_DISTANCE_STRATEGY = DistanceStrategy.COSINE
 
+# Name of the pgvector comparator implementing each distance strategy.
+_DISTANCE_OPERATORS = {
+    DistanceStrategy.EUCLIDEAN: "l2_distance",
+    DistanceStrategy.COSINE: "cosine_distance",
+    DistanceStrategy.MAX_INNER_PRODUCT: "max_inner_product",
+}
+
 Base = declarative_base()  # type: Any
 
 
@@ -105,6 +117,17 @@ def _get_embedding_collection_store(vector_dimension: Optional[int] = None) -> A
 
     from pgvector.sqlalchemy import Vector  # type: ignore
 
+    class _Float32Vector(Vector):
+        """pgvector column type binding values at the precision it stores."""
+
+        cache_ok = True
+
+        def bind_processor(self, dialect: Any) -> Callable[[Any], Optional[str]]:
+            def process(value: Any) -> Optional[str]:
+                return _vector_to_db(value, self.dim)
+
+            return process
+
     class CollectionStore(Base):
         """Collection store."""
 
@@ -210,7 +233,7 @@ def _get_embedding_collection_store(vector_dimension: Optional[int] = None) -> A
         )
         collection = relationship(CollectionStore, back_populates="embeddings")
 
-        embedding: Vector = sqlalchemy.Column(Vector(vector_dimension))
+        embedding: Vector = sqlalchemy.Column(_Float32Vector(vector_dimension))
         document = sqlalchemy.Column(sqlalchemy.String, nullable=True)
         cmetadata = sqlalchemy.Column(JSONB, nullable=True)
 
@@ -228,6 +251,65 @@ def _get_embedding_collection_store(vector_dimension: Optional[int] = None) -> A
     return _classes
 
 
+T = TypeVar("T")
+
+# A single embedding: a list of floats or a 1-D numpy array. pgvector binds
+# arrays as-is, so a 2-D embedding matrix never has to be copied into a list of
+# lists before being written.
+EmbeddingVector = Union[List[float], np.ndarray]
+
+# (text, metadata, embedding, id) as passed to PGVector._upsert_stmt
+_UpsertRow = Tuple[str, Optional[dict], EmbeddingVector, str]
+
+# Rows of one aadd_embeddings call waiting to be coalesced, and the future
+# resolved once they are written. None asks the coalescing task to stop.
+_CoalescedWrite = Optional[Tuple[List[_UpsertRow], "asyncio.Future[None]"]]
+
+
+def _batched(iterable: Iterable[T], n: int) -> Iterator[Tuple[T, ...]]:
+    """Yield successive tuples of at most ``n`` items from ``iterable``."""
+    if n < 1:
+        raise ValueError(f"batch size must be at least 1, got: {n}")
+    it = iter(iterable)
+    while batch := tuple(islice(it, n)):
+        yield batch
+
+
+def _vector_to_db(value: Any, dim: Optional[int] = None) -> Optional[str]:
+    """Format a vector as pgvector text input at single precision.
+
+    pgvector stores every component as a 4-byte float. pgvector's own encoder
+    writes the shortest repr of the float64 value, up to 17 significant digits
+    per component. Casting to float32 first and writing 9 significant digits,
+    which is enough to round-trip any float32, stores exactly the same values
+    with far less text sent to the server.
+    """
+    if value is None:
+        return None
+    array = np.asarray(value, dtype=np.float32)
+    if array.ndim != 1:
+        raise ValueError("expected ndim to be 1")
+    if dim is not None and len(array) != dim:
+        raise ValueError(f"expected {dim} dimensions, not {len(array)}")
+    return "[" + ",".join(["%.9g" % v for v in array.tolist()]) + "]"
+
+
+def _reuse_stored_embeddings(
+    texts: Sequence[str],
+    ids: Sequence[Optional[str]],
+    stored: Dict[str, Tuple[str, EmbeddingVector]],
+) -> List[Optional[EmbeddingVector]]:
+    """Return the stored embedding of each text whose stored text is unchanged.
+
+    Texts that are new or have changed get None and still need to be embedded.
+    """
+    embeddings: List[Optional[EmbeddingVector]] = []
+    for text, id in zip(texts, ids):
+        document, embedding = stored.get(id, (None, None)) if id else (None, None)
+        embeddings.append(embedding if document == text else None)
+    return embeddings
+
+
 def _results_to_docs(docs_and_scores: Any) -> List[Document]:
     """Return docs from docs and scores."""
     return [doc for doc, _ in docs_and_scores]
@@ -387,6 +469,7 @@ class PGVector(VectorStore):
         use_jsonb: bool = True,
         create_extension: bool = True,
         async_mode: bool = False,
+        reuse_embeddings: bool = False,
     ) -> None:
         """Initialize the PGVector store.
         For an async version, use `PGVector.acreate()` instead.
@@ -415,6 +498,12 @@ class PGVector(VectorStore):
             create_extension: If True, will create the vector extension if it
                 doesn't exist. disabling creation is useful when using ReadOnly
                 Databases.
+            reuse_embeddings: If True, when adding texts with ids, documents
+                already stored in the collection under the same id and with the
+                same text keep their stored embedding instead of being embedded
+                again. (default: False)
+                NOTE: Only enable this if every document in the collection was
+                embedded with the current embedding model.
         """
         self.async_mode = async_mode
         self.embedding_function = embeddings
@@ -455,6 +544,12 @@ class PGVector(VectorStore):
 
         self.use_jsonb = use_jsonb
         self.create_extension = create_extension
+        self.reuse_embeddings = reuse_embeddings
+        # Write coalescing is opt-in, see enable_coalescing.
+        self._coalesce_max_batch: Optional[int] = None
+        self._coalesce_max_delay = 0.0
+        self._coalesce_queue: Optional[asyncio.Queue[_CoalescedWrite]] = None
+        self._coalesce_task: Optional[asyncio.Task[None]] = None
 
         if not use_jsonb:
             # Replace with a deprecation warning.
@@ -587,10 +682,32 @@ class PGVector(VectorStore):
             await session.delete(collection)
             await session.commit()
 
+    def _id_in(self, ids: Sequence[str]) -> Any:
+        """Match rows whose id is one of ``ids``.
+
+        The ids are bound as a single array parameter (``id = ANY(:ids)``)
+        rather than one parameter per id, so the SQL text does not grow with
+        the number of ids and is the same for every batch.
+        """
+        return self.EmbeddingStore.id == sqlalchemy.any_(
+            sqlalchemy.literal(list(ids), ARRAY(sqlalchemy.String))
+        )
+
+    def _delete_stmt(
+        self, ids: Sequence[str], collection_id: Optional[Any] = None
+    ) -> Any:
+        """Build a statement deleting ``ids``, optionally only in one collection."""
+        stmt = delete(self.EmbeddingStore)
+        if collection_id is not None:
+            stmt = stmt.where(self.EmbeddingStore.collection_id == collection_id)
+        return stmt.where(self._id_in(ids))
+
     def delete(
         self,
         ids: Optional[List[str]] = None,
         collection_only: bool = False,
+        *,
+        batch_size: int = 500,
         **kwargs: Any,
     ) -> None:
         """Delete vectors by ids or uuids.
@@ -598,34 +715,38 @@ class PGVector(VectorStore):
         Args:
             ids: List of ids to delete.
             collection_only: Only delete ids in the collection.
+            batch_size: Maximum number of ids per delete statement.
+                (default: 500)
         """
-        with self._make_sync_session() as session:
-            if ids is not None:
-                self.logger.debug(
-                    "Trying to delete vectors by ids (represented by the model "
-                    "using the custom ids field)"
-                )
-
-                stmt = delete(self.EmbeddingStore)
+        if not ids:
+            # Nothing to delete, skip the round trip to the database.
+            return
 
-                if collection_only:
-                    collection = self.get_collection(session)
-                    if not collection:
-                        self.logger.warning("Collection not found")
-                        return
+        with self._make_sync_session() as session:
+            self.logger.debug(
+                "Trying to delete vectors by ids (represented by the model "
+                "using the custom ids field)"
+            )
 
-                    stmt = stmt.where(
-                        self.EmbeddingStore.collection_id == collection.uuid
-                    )
+            collection_id = None
+            if collection_only:
+                collection = self.get_collection(session)
+                if not collection:
+                    self.logger.warning("Collection not found")
+                    return
+                collection_id = collection.uuid
 
-                stmt = stmt.where(self.EmbeddingStore.id.in_(ids))
-                session.execute(stmt)
+            for batch in _batched(ids, batch_size):
+                session.execute(self._delete_stmt(batch, collection_id))
             session.commit()
 
     async def adelete(
         self,
         ids: Optional[List[str]] = None,
         collection_only: bool = False,
+        *,
+        batch_size: int = 500,
+        max_concurrency: int = 1,
         **kwargs: Any,
     ) -> None:
         """Async delete vectors by ids or uuids.
@@ -633,30 +754,48 @@ class PGVector(VectorStore):
         Args:
             ids: List of ids to delete.
             collection_only: Only delete ids in the collection.
+            batch_size: Maximum number of ids per delete statement.
+                (default: 500)
+            max_concurrency: Maximum number of batches deleted concurrently.
+                (default: 1)
+                NOTE: With a value greater than 1 each batch is deleted on its
+                own connection and committed in its own transaction. If a batch
+                fails, the first error is raised once every other batch has
+                finished, and those batches stay deleted. Keep it at or below
+                the size of the engine's connection pool.
         """
+        if not ids:
+            # Nothing to delete, skip the round trip to the database.
+            return
+
         await self.__apost_init__()  # Lazy async init
         async with self._make_async_session() as session:
-            if ids is not None:
-                self.logger.debug(
-                    "Trying to delete vectors by ids (represented by the model "
-                    "using the custom ids field)"
-                )
-
-                stmt = delete(self.EmbeddingStore)
-
-                if collection_only:
-                    collection = await self.aget_collection(session)
-                    if not collection:
-                        self.logger.warning("Collection not found")
-                        return
+            self.logger.debug(
+                "Trying to delete vectors by ids (represented by the model "
+                "using the custom ids field)"
+            )
 
-                    stmt = stmt.where(
-                        self.EmbeddingStore.collection_id == collection.uuid
-                    )
+            collection_id = None
+            if collection_only:
+                collection = await self.aget_collection(session)
+                if not collection:
+                    self.logger.warning("Collection not found")
+                    return
+                collection_id = collection.uuid
+
+            batches = _batched(ids, batch_size)
+            if max_concurrency <= 1:
+                for batch in batches:
+                    await session.execute(self._delete_stmt(batch, collection_id))
+                await session.commit()
+                return
 
-                stmt = stmt.where(self.EmbeddingStore.id.in_(ids))
-                await session.execute(stmt)
-            await session.commit()
+        # Concurrent batches check out their own connections, so the session
+        # above is closed first instead of holding one idle during the deletes.
+        await self._aexecute_concurrently(
+            (self._delete_stmt(batch, collection_id) for batch in batches),
+            max_concurrency,
+        )
 
     def get_collection(self, session: Session) -> Any:
         assert not self._async_engine, "This method must be called without async_mode"
@@ -686,9 +825,6 @@ class PGVector(VectorStore):
         if ids is None:
             ids = [str(uuid.uuid4()) for _ in texts]
 
-        if not metadatas:
-            metadatas = [{} for _ in texts]
-
         store = cls(
             connection=connection,
             collection_name=collection_name,
@@ -724,9 +860,6 @@ class PGVector(VectorStore):
         if ids is None:
             ids = [str(uuid.uuid1()) for _ in texts]
 
-        if not metadatas:
-            metadatas = [{} for _ in texts]
-
         store = cls(
             connection=connection,
             collection_name=collection_name,
@@ -744,22 +877,62 @@ class PGVector(VectorStore):
 
         return store
 
+    def _upsert_stmt(
+        self,
+        collection_id: Any,
+        rows: Sequence[_UpsertRow],
+    ) -> Any:
+        """Build a single multi-row upsert statement for a batch of rows.
+
+        Args:
+            collection_id: UUID of the collection the rows belong to.
+            rows: Tuples of (text, metadata, embedding, id).
+        """
+        data = [
+            {
+                "id": id,
+                "collection_id": collection_id,
+                "embedding": embedding,
+                "document": text,
+                "cmetadata": metadata or {},
+            }
+            for text, metadata, embedding, id in rows
+        ]
+        stmt = insert(self.EmbeddingStore).values(data)
+        return stmt.on_conflict_do_update(
+            index_elements=["id"],
+            # Conflict detection based on these columns
+            set_={
+                "embedding": stmt.excluded.embedding,
+                "document": stmt.excluded.document,
+                "cmetadata": stmt.excluded.cmetadata,
+            },
+        )
+
     def add_embeddings(
         self,
         texts: Sequence[str],
-        embeddings: List[List[float]],
+        embeddings: Union[Sequence[EmbeddingVector], np.ndarray],
         metadatas: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None,
+        *,
+        batch_size: int = 500,
         **kwargs: Any,
     ) -> List[str]:
         """Add embeddings to the vectorstore.
 
+        Rows are written with one multi-row ``INSERT ... ON CONFLICT DO UPDATE``
+        statement per batch, all within a single transaction.
+
         Args:
             texts: Iterable of strings to add to the vectorstore.
-            embeddings: List of list of embedding vectors.
+            embeddings: List of embedding vectors, each a list of floats or a
+                1-D numpy array, or a 2-D numpy array with one row per text.
             metadatas: List of metadatas associated with the texts.
             ids: Optional list of ids for the documents.
                  If not provided, will generate a new id for each document.
+            batch_size: Maximum number of rows per insert statement.
+                (default: 500)
             kwargs: vectorstore specific parameters
         """
         assert not self._async_engine, "This method must be called with sync_mode"
@@ -768,36 +941,16 @@ class PGVector(VectorStore):
         else:
             ids_ = [id if id is not None else str(uuid.uuid4()) for id in ids]
 
-        if not metadatas:
-            metadatas = [{} for _ in texts]
+        # Rows without metadata are stored with an empty dict by _upsert_stmt,
+        # so there is no need to allocate a placeholder per text.
+        metadatas_: Iterable[Optional[dict]] = metadatas or repeat(None)
 
         with self._make_sync_session() as session:  # type: ignore[arg-type]
             collection = self.get_collection(session)
             if not collection:
                 raise ValueError("Collection not found")
-            data = [
-                {
-                    "id": id,
-                    "collection_id": collection.uuid,
-                    "embedding": embedding,
-                    "document": text,
-                    "cmetadata": metadata or {},
-                }
-                for text, metadata, embedding, id in zip(
-                    texts, metadatas, embeddings, ids_
-                )
-            ]
-            stmt = insert(self.EmbeddingStore).values(data)
-            on_conflict_stmt = stmt.on_conflict_do_update(
-                index_elements=["id"],
-                # Conflict detection based on these columns
-                set_={
-                    "embedding": stmt.excluded.embedding,
-                    "document": stmt.excluded.document,
-                    "cmetadata": stmt.excluded.cmetadata,
-                },
-            )
-            session.execute(on_conflict_stmt)
+            for batch in _batched(zip(texts, metadatas_, embeddings, ids_), batch_size):
+                session.execute(self._upsert_stmt(collection.uuid, batch))
             session.commit()
 
         return ids_
@@ -805,19 +958,41 @@ class PGVector(VectorStore):
     async def aadd_embeddings(
         self,
         texts: Sequence[str],
-        embeddings: List[List[float]],
+        embeddings: Union[Sequence[EmbeddingVector], np.ndarray],
         metadatas: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None,
+        *,
+        batch_size: int = 500,
+        max_concurrency: int = 1,
         **kwargs: Any,
     ) -> List[str]:
         """Async add embeddings to the vectorstore.
 
+        Rows are written with one multi-row ``INSERT ... ON CONFLICT DO UPDATE``
+        statement per batch. By default all batches share a single transaction.
+
+        When coalescing is enabled with enable_coalescing, the rows are instead
+        handed to the coalescing task, and batch_size and max_concurrency are
+        ignored. The rows are written with those of other calls in one
+        transaction, so a failure of any of those calls is raised by all of
+        them. Rows that were queued are still written if the call is cancelled.
+
         Args:
             texts: Iterable of strings to add to the vectorstore.
-            embeddings: List of list of embedding vectors.
+            embeddings: List of embedding vectors, each a list of floats or a
+                1-D numpy array, or a 2-D numpy array with one row per text.
             metadatas: List of metadatas associated with the texts.
             ids: Optional list of ids for the texts.
                  If not provided, will generate a new id for each text.
+            batch_size: Maximum number of rows per insert statement.
+                (default: 500)
+            max_concurrency: Maximum number of batches written concurrently.
+                (default: 1)
+                NOTE: With a value greater than 1 each batch is written on its
+                own connection and committed in its own transaction. If a batch
+                fails, the first error is raised once every other batch has
+                finished, and those batches stay committed. Keep it at or below
+                the size of the engine's connection pool.
             kwargs: vectorstore specific parameters
         """
         await self.__apost_init__()  # Lazy async init
@@ -827,39 +1002,249 @@ class PGVector(VectorStore):
         else:
             ids_ = [id if id is not None else str(uuid.uuid4()) for id in ids]
 
-        if not metadatas:
-            metadatas = [{} for _ in texts]
+        # Rows without metadata are stored with an empty dict by _upsert_stmt,
+        # so there is no need to allocate a placeholder per text.
+        metadatas_: Iterable[Optional[dict]] = metadatas or repeat(None)
+
+        if self._coalesce_max_batch is not None:
+            await self._aenqueue_upsert(list(zip(texts, metadatas_, embeddings, ids_)))
+            return ids_
 
         async with self._make_async_session() as session:  # type: ignore[arg-type]
             collection = await self.aget_collection(session)
             if not collection:
                 raise ValueError("Collection not found")
-            data = [
-                {
-                    "id": id,
-                    "collection_id": collection.uuid,
-                    "embedding": embedding,
-                    "document": text,
-                    "cmetadata": metadata or {},
-                }
-                for text, metadata, embedding, id in zip(
-                    texts, metadatas, embeddings, ids_
-                )
-            ]
-            stmt = insert(self.EmbeddingStore).values(data)
-            on_conflict_stmt = stmt.on_conflict_do_update(
-                index_elements=["id"],
-                # Conflict detection based on these columns
-                set_={
-                    "embedding": stmt.excluded.embedding,
-                    "document": stmt.excluded.document,
-                    "cmetadata": stmt.excluded.cmetadata,
-                },
+            batches = _batched(zip(texts, metadatas_, embeddings, ids_), batch_size)
+            if max_concurrency <= 1:
+                for batch in batches:
+                    await session.execute(self._upsert_stmt(collection.uuid, batch))
+                await session.commit()
+                return ids_
+
+        # Concurrent batches check out their own connections, so the session
+        # above is closed first instead of holding one idle during the writes.
+        await self._aexecute_concurrently(
+            (self._upsert_stmt(collection.uuid, batch) for batch in batches),
+            max_concurrency,
+        )
+        return ids_
+
+    async def _aexecute_concurrently(
+        self, stmts: Iterable[Any], max_concurrency: int
+    ) -> None:
+        """Execute statements concurrently, each in its own session and transaction.
+
+        ``max_concurrency`` workers pull from the shared iterator, so statements
+        are only built once a worker is free to execute them.
+        """
+        it = iter(stmts)
+        errors: List[BaseException] = []
+
+        async def _worker() -> None:
+            for stmt in it:
+                try:
+                    async with self._make_async_session() as session:
+                        await session.execute(stmt)
+                        await session.commit()
+                except Exception as e:
+                    # Keep going so the remaining batches still run, the
+                    # error is raised once every worker is done.
+                    errors.append(e)
+
+        results = await asyncio.gather(
+            *(_worker() for _ in range(max_concurrency)), return_exceptions=True
+        )
+        errors.extend(r for r in results if isinstance(r, BaseException))
+        # Only raise once every batch has settled, so no write is still in
+        # flight when the caller sees the error.
+        if errors:
+            raise errors[0]
+
+    def enable_coalescing(self, max_batch: int = 500, max_delay_ms: float = 20) -> None:
+        """Coalesce concurrent aadd_embeddings calls into multi-row upserts.
+
+        Once enabled, aadd_embeddings queues its rows and waits for a background
+        task to write them. The task gathers the rows of calls arriving within
+        max_delay_ms of the first one, up to max_batch rows, and writes them
+        with a single upsert in one transaction. This amortizes statement and
+        transaction overhead when many producers add a few documents each.
+
+        Args:
+            max_batch: Maximum number of rows written by one statement.
+                (default: 500)
+            max_delay_ms: Maximum time in milliseconds a call waits for other
+                calls to join its batch. (default: 20)
+
+        NOTE: All calls coalesced into one batch share its transaction, so rows
+        rejected from one call fail the write and the error is raised by every
+        call in the batch. A call that is cancelled after queueing its rows does
+        not withdraw them, they are still written. Use adisable_coalescing to
+        write pending rows and stop the background task.
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least one")
+        if max_delay_ms < 0:
+            raise ValueError("max_delay_ms must not be negative")
+        self._coalesce_max_batch = max_batch
+        self._coalesce_max_delay = max_delay_ms / 1000
+
+    async def adisable_coalescing(self) -> None:
+        """Write the pending coalesced rows and stop the background task."""
+        self._coalesce_max_batch = None
+        queue, task = self._coalesce_queue, self._coalesce_task
+        self._coalesce_queue = self._coalesce_task = None
+        if queue is not None and task is not None and not task.done():
+            await queue.put(None)
+            await task
+
+    async def _aenqueue_upsert(self, rows: List[_UpsertRow]) -> None:
+        """Hand rows to the coalescing task and wait until they are written."""
+        if self._coalesce_task is None or self._coalesce_task.done():
+            # Created lazily so both are bound to the running event loop.
+            self._coalesce_queue = asyncio.Queue()
+            self._coalesce_task = asyncio.create_task(
+                self._acoalesce_upserts(self._coalesce_queue)
             )
-            await session.execute(on_conflict_stmt)
+        future = asyncio.get_running_loop().create_future()
+        await typing_cast(asyncio.Queue, self._coalesce_queue).put((rows, future))
+        await future
+
+    async def _acoalesce_upserts(self, queue: asyncio.Queue[_CoalescedWrite]) -> None:
+        """Drain queued writes into batches until asked to stop."""
+        loop = asyncio.get_running_loop()
+        carry: _CoalescedWrite = None
+        while True:
+            write = carry or await queue.get()
+            carry = None
+            if write is None:
+                return
+            writes = [write]
+            rows = list(write[0])
+            ids = {row[3] for row in rows}
+            max_batch = self._coalesce_max_batch or max(len(rows), 1)
+            deadline = loop.time() + self._coalesce_max_delay
+            stop = False
+            while len(rows) < max_batch:
+                try:
+                    # Writes already queued join the batch even once the
+                    # deadline has passed, only waiting for more is bounded.
+                    write = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        write = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if write is None:
+                    stop = True
+                    break
+                write_ids = {row[3] for row in write[0]}
+                if not ids.isdisjoint(write_ids):
+                    # Postgres rejects an upsert touching the same row twice,
+                    # so a repeated id starts the next batch instead.
+                    carry = write
+                    break
+                writes.append(write)
+                rows.extend(write[0])
+                ids |= write_ids
+
+            try:
+                await self._aupsert_rows(rows, max_batch)
+            except Exception as e:
+                for _, future in writes:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in writes:
+                    if not future.done():
+                        future.set_result(None)
+            if stop:
+                return
+
+    async def _aupsert_rows(self, rows: Sequence[_UpsertRow], batch_size: int) -> None:
+        """Upsert rows into the collection within a single transaction."""
+        async with self._make_async_session() as session:  # type: ignore[arg-type]
+            collection = await self.aget_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            for batch in _batched(rows, batch_size):
+                await session.execute(self._upsert_stmt(collection.uuid, batch))
             await session.commit()
 
-        return ids_
+    def _stored_embeddings_stmt(self, collection_id: Any, ids: Sequence[str]) -> Any:
+        """Select the stored text and embedding of ``ids`` in a collection."""
+        return select(
+            self.EmbeddingStore.id,
+            self.EmbeddingStore.document,
+            self.EmbeddingStore.embedding,
+        ).where(
+            self.EmbeddingStore.collection_id == collection_id,
+            self._id_in(ids),
+        )
+
+    def _embed_changed_documents(
+        self,
+        texts: List[str],
+        ids: List[Optional[str]],
+        *,
+        batch_size: int = 500,
+    ) -> List[EmbeddingVector]:
+        """Embed texts, reusing the stored embeddings of unchanged documents.
+
+        Stored embeddings are looked up ``batch_size`` ids at a time.
+        """
+        stored: Dict[str, Tuple[str, EmbeddingVector]] = {}
+        with self._make_sync_session() as session:
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            for batch in _batched(filter(None, ids), batch_size):
+                stmt = self._stored_embeddings_stmt(collection.uuid, batch)
+                for id, document, embedding in session.execute(stmt):
+                    stored[id] = (document, embedding)
+
+        embeddings = _reuse_stored_embeddings(texts, ids, stored)
+        changed = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if changed:
+            new_embeddings = self.embedding_function.embed_documents(
+                [texts[i] for i in changed]
+            )
+            for i, embedding in zip(changed, new_embeddings):
+                embeddings[i] = embedding
+        return typing_cast(List[EmbeddingVector], embeddings)
+
+    async def _aembed_changed_documents(
+        self,
+        texts: List[str],
+        ids: List[Optional[str]],
+        *,
+        batch_size: int = 500,
+    ) -> List[EmbeddingVector]:
+        """Embed texts, reusing the stored embeddings of unchanged documents.
+
+        Stored embeddings are looked up ``batch_size`` ids at a time.
+        """
+        stored: Dict[str, Tuple[str, EmbeddingVector]] = {}
+        async with self._make_async_session() as session:
+            collection = await self.aget_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            for batch in _batched(filter(None, ids), batch_size):
+                stmt = self._stored_embeddings_stmt(collection.uuid, batch)
+                for id, document, embedding in await session.execute(stmt):
+                    stored[id] = (document, embedding)
+
+        embeddings = _reuse_stored_embeddings(texts, ids, stored)
+        changed = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if changed:
+            new_embeddings = await self.embedding_function.aembed_documents(
+                [texts[i] for i in changed]
+            )
+            for i, embedding in zip(changed, new_embeddings):
+                embeddings[i] = embedding
+        return typing_cast(List[EmbeddingVector], embeddings)
 
     def add_texts(
         self,
@@ -882,7 +1267,11 @@ class PGVector(VectorStore):
         """
         assert not self._async_engine, "This method must be called without async_mode"
         texts_ = list(texts)
-        embeddings = self.embedding_function.embed_documents(texts_)
+        embeddings: Sequence[EmbeddingVector]
+        if self.reuse_embeddings and ids:
+            embeddings = self._embed_changed_documents(texts_, list(ids))
+        else:
+            embeddings = self.embedding_function.embed_documents(texts_)
         return self.add_embeddings(
             texts=texts_,
             embeddings=list(embeddings),
@@ -912,7 +1301,11 @@ class PGVector(VectorStore):
         """
         await self.__apost_init__()  # Lazy async init
         texts_ = list(texts)
-        embeddings = await self.embedding_function.aembed_documents(texts_)
+        embeddings: Sequence[EmbeddingVector]
+        if self.reuse_embeddings and ids:
+            embeddings = await self._aembed_changed_documents(texts_, list(ids))
+        else:
+            embeddings = await self.embedding_function.aembed_documents(texts_)
         return await self.aadd_embeddings(
             texts=texts_,
             embeddings=list(embeddings),
@@ -1019,17 +1412,14 @@ class PGVector(VectorStore):
 
     @property
     def distance_strategy(self) -> Any:
-        if self._distance_strategy == DistanceStrategy.EUCLIDEAN:
-            return self.EmbeddingStore.embedding.l2_distance
-        elif self._distance_strategy == DistanceStrategy.COSINE:
-            return self.EmbeddingStore.embedding.cosine_distance
-        elif self._distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
-            return self.EmbeddingStore.embedding.max_inner_product
-        else:
+        try:
+            operator = _DISTANCE_OPERATORS[self._distance_strategy]
+        except KeyError:
             raise ValueError(
                 f"Got unexpected value for distance: {self._distance_strategy}. "
                 f"Should be one of {', '.join([ds.value for ds in DistanceStrategy])}."
-            )
+            ) from None
+        return getattr(self.EmbeddingStore.embedding, operator)
 
     def similarity_search_with_score_by_vector(
         self,
@@ -1202,50 +1592,51 @@ class PGVector(VectorStore):
         EQ, LIKE, CONTAINS, OR, AND = "eq", "like", "contains", "or", "and"
 
         value_case_insensitive = {k.lower(): v for k, v in value.items()}
-        if IN in map(str.lower, value):
+        keys = value_case_insensitive.keys()  # O(1) operator lookups
+        if IN in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext.in_(
                 value_case_insensitive[IN]
             )
-        elif NIN in map(str.lower, value):
+        elif NIN in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext.not_in(
                 value_case_insensitive[NIN]
             )
-        elif BETWEEN in map(str.lower, value):
+        elif BETWEEN in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext.between(
                 str(value_case_insensitive[BETWEEN][0]),
                 str(value_case_insensitive[BETWEEN][1]),
             )
-        elif GT in map(str.lower, value):
+        elif GT in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext > str(
                 value_case_insensitive[GT]
             )
-        elif LT in map(str.lower, value):
+        elif LT in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext < str(
                 value_case_insensitive[LT]
             )
-        elif NE in map(str.lower, value):
+        elif NE in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext != str(
                 value_case_insensitive[NE]
             )
-        elif EQ in map(str.lower, value):
+        elif EQ in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext == str(
                 value_case_insensitive[EQ]
             )
-        elif LIKE in map(str.lower, value):
+        elif LIKE in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext.like(
                 value_case_insensitive[LIKE]
             )
-        elif CONTAINS in map(str.lower, value):
+        elif CONTAINS in keys:
             filter_by_metadata = self.EmbeddingStore.cmetadata[key].astext.contains(
                 value_case_insensitive[CONTAINS]
             )
-        elif OR in map(str.lower, value):
+        elif OR in keys:
             or_clauses = [
                 self._create_filter_clause(key, sub_value)
                 for sub_value in value_case_insensitive[OR]
             ]
             filter_by_metadata = sqlalchemy.or_(*or_clauses)
-        elif AND in map(str.lower, value):
+        elif AND in keys:
             and_clauses = [
                 self._create_filter_clause(key, sub_value)
                 for sub_value in value_case_insensitive[AND]
@@ -1391,6 +1782,21 @@ class PGVector(VectorStore):
                 f"Invalid type: Expected a dictionary but got type: {type(filters)}"
             )
 
+    def _query_filter_clauses(
+        self, collection: Any, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Build the WHERE clauses for a similarity query against the collection."""
+        filter_by = [self.EmbeddingStore.collection_id == collection.uuid]
+        if filter:
+            if self.use_jsonb:
+                filter_clauses = self._create_filter_clause(filter)
+                if filter_clauses is not None:
+                    filter_by.append(filter_clauses)
+            else:
+                # Old way of doing things
+                filter_by.extend(self._create_filter_clause_json_deprecated(filter))
+        return filter_by
+
     def __query_collection(
         self,
         embedding: List[float],
@@ -1403,18 +1809,7 @@ class PGVector(VectorStore):
             if not collection:
                 raise ValueError("Collection not found")
 
-            filter_by = [self.EmbeddingStore.collection_id == collection.uuid]
-            if filter:
-                if self.use_jsonb:
-                    filter_clauses = self._create_filter_clause(filter)
-                    if filter_clauses is not None:
-                        filter_by.append(filter_clauses)
-                else:
-                    # Old way of doing things
-                    filter_clauses = self._create_filter_clause_json_deprecated(filter)
-                    filter_by.extend(filter_clauses)
-
-            _type = self.EmbeddingStore
+            filter_by = self._query_filter_clauses(collection, filter)
 
             results: List[Any] = (
                 session.query(
@@ -1446,18 +1841,7 @@ class PGVector(VectorStore):
             if not collection:
                 raise ValueError("Collection not found")
 
-            filter_by = [self.EmbeddingStore.collection_id == collection.uuid]
-            if filter:
-                if self.use_jsonb:
-                    filter_clauses = self._create_filter_clause(filter)
-                    if filter_clauses is not None:
-                        filter_by.append(filter_clauses)
-                else:
-                    # Old way of doing things
-                    filter_clauses = self._create_filter_clause_json_deprecated(filter)
-                    filter_by.extend(filter_clauses)
-
-            _type = self.EmbeddingStore
+            filter_by = self._query_filter_clauses(collection, filter)
 
             stmt = (
                 select(
@@ -1869,6 +2253,20 @@ class PGVector(VectorStore):
                 "Consider providing relevance_score_fn to PGVector constructor."
             )
 
+    def _similarity_to_query(self, results: Sequence[Any]) -> Optional[np.ndarray]:
+        """Cosine similarity of each result to the query, if already known.
+
+        With the cosine distance strategy the database has computed the
+        distance of every candidate to the query, so it can be reused instead
+        of being computed again in Python.
+        """
+        if self._distance_strategy != DistanceStrategy.COSINE:
+            return None
+        distances = np.array([result.distance for result in results], dtype=float)
+        # Zero vectors have an undefined (NaN) cosine distance, treat them as
+        # dissimilar like cosine_similarity does.
+        return 1.0 - np.nan_to_num(distances, nan=1.0)
+
     def max_marginal_relevance_search_with_score_by_vector(
         self,
         embedding: List[float],
@@ -1909,6 +2307,7 @@ class PGVector(VectorStore):
             embedding_list,
             k=k,
             lambda_mult=lambda_mult,
+            similarity_to_query=self._similarity_to_query(results),
         )
 
         candidates = self._results_to_docs_and_scores(results)
@@ -1958,6 +2357,7 @@ class PGVector(VectorStore):
                 embedding_list,
                 k=k,
                 lambda_mult=lambda_mult,
+                similarity_to_query=self._similarity_to_query(results),
             )
 
             candidates = self._results_to_docs_and_scores(results)
@@ -2227,53 +2627,78 @@ class PGVector(VectorStore):
         async with self.session_maker() as session:
             yield typing_cast(AsyncSession, session)
 
-    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
-        """Get documents by ids."""
-        documents = []
+    def lazy_get_by_ids(
+        self, ids: Iterable[str], /, *, batch_size: int = 256
+    ) -> Iterator[Document]:
+        """Lazily get documents by ids.
+
+        Ids are looked up ``batch_size`` at a time, so documents from the first
+        batch are yielded before the remaining batches are queried.
+        """
         with self._make_sync_session() as session:
             collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
             filter_by = [self.EmbeddingStore.collection_id == collection.uuid]
-            stmt = (
-                select(
-                    self.EmbeddingStore,
+
+            for batch in _batched(ids, batch_size):
+                stmt = (
+                    select(
+                        self.EmbeddingStore,
+                    )
+                    .where(self._id_in(batch))
+                    .filter(*filter_by)
                 )
-                .where(self.EmbeddingStore.id.in_(ids))
-                .filter(*filter_by)
-            )
 
-            for result in session.execute(stmt).scalars().all():
-                documents.append(
-                    Document(
+                for result in session.scalars(stmt):
+                    yield Document(
                         id=result.id,
                         page_content=result.document,
                         metadata=result.cmetadata,
                     )
-                )
-        return documents
 
-    async def aget_by_ids(self, ids: Sequence[str], /) -> List[Document]:
-        """Get documents by ids."""
-        documents = []
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        """Get documents by ids.
+
+        Use ``lazy_get_by_ids`` to iterate over the documents without loading
+        all of them into memory at once.
+        """
+        return list(self.lazy_get_by_ids(ids))
+
+    async def alazy_get_by_ids(
+        self, ids: Iterable[str], /, *, batch_size: int = 256
+    ) -> AsyncIterator[Document]:
+        """Lazily get documents by ids.
+
+        Ids are looked up ``batch_size`` at a time, so documents from the first
+        batch are yielded before the remaining batches are queried.
+        """
         async with self._make_async_session() as session:
             collection = await self.aget_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
             filter_by = [self.EmbeddingStore.collection_id == collection.uuid]
 
-            stmt = (
-                select(
-                    self.EmbeddingStore,
+            for batch in _batched(ids, batch_size):
+                stmt = (
+                    select(
+                        self.EmbeddingStore,
+                    )
+                    .where(self._id_in(batch))
+                    .filter(*filter_by)
                 )
-                .where(self.EmbeddingStore.id.in_(ids))
-                .filter(*filter_by)
-            )
-
-            results: Sequence[Any] = (await session.execute(stmt)).scalars().all()
 
-            for result in results:
-                documents.append(
-                    Document(
+                for result in await session.scalars(stmt):
+                    yield Document(
                         id=str(result.id),
                         page_content=result.document,
                         metadata=result.cmetadata,
                     )
-                )
-        return documents
+
+    async def aget_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        """Get documents by ids.
+
+        Use ``alazy_get_by_ids`` to iterate over the documents without loading
+        all of them into memory at once.
+        """
+        return [document async for document in self.alazy_get_by_ids(ids)]
@@ -0,0 +1,45 @@
+"""Test the helper functions in langchain_postgres._utils."""
+import numpy as np
+
+from langchain_postgres._utils import maximal_marginal_relevance
+
+
+def test_maximal_marginal_relevance_lambda_one() -> None:
+    """With lambda_mult=1 the results are ordered by similarity to the query."""
+    query_embedding = np.array([1.0, 0.0])
+    embedding_list = [[0.0, 1.0], [1.0, 0.1], [1.0, 0.5], [1.0, 0.0]]
+    assert maximal_marginal_relevance(
+        query_embedding, embedding_list, lambda_mult=1.0, k=4
+    ) == [3, 1, 2, 0]
+
+
+def test_maximal_marginal_relevance_diversity() -> None:
+    """Lower lambda_mult values favor embeddings unlike those already selected."""
+    query_embedding = np.array([1.0, 0.0])
+    embedding_list = [[1.0, 0.0], [1.0, 0.05], [0.6, 0.8]]
+    assert maximal_marginal_relevance(
+        query_embedding, embedding_list, lambda_mult=0.25, k=2
+    ) == [0, 2]
+    assert maximal_marginal_relevance(
+        query_embedding, embedding_list, lambda_mult=1.0, k=2
+    ) == [0, 1]
+
+
+def test_maximal_marginal_relevance_k_larger_than_candidates() -> None:
+    """k is capped at the number of candidate embeddings."""
+    query_embedding = np.array([1.0, 0.0])
+    assert maximal_marginal_relevance(query_embedding, [[1.0, 1.0]], k=4) == [0]
+    assert maximal_marginal_relevance(query_embedding, [], k=4) == []
+
+
+def test_maximal_marginal_relevance_precomputed_similarity() -> None:
+    """Precomputed query similarities are used instead of being recomputed."""
+    query_embedding = np.array([1.0, 0.0])
+    embedding_list = [[1.0, 0.0], [0.0, 1.0]]
+    assert maximal_marginal_relevance(
+        query_embedding,
+        embedding_list,
+        lambda_mult=1.0,
+        k=1,
+        similarity_to_query=np.array([0.0, 1.0]),
+    ) == [1]
@@ -1,15 +1,19 @@
 """Test PGVector functionality."""
+import asyncio
 import contextlib
-from typing import Any, AsyncGenerator, Dict, Generator, List, Optional
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional, Sequence
 
+import numpy as np
 import pytest
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from sqlalchemy import select
+from sqlalchemy import select, text
+from sqlalchemy.exc import StatementError
 
 from langchain_postgres.vectorstores import (
     SUPPORTED_OPERATORS,
     PGVector,
+    _vector_to_db,
 )
 from tests.unit_tests.fake_embeddings import FakeEmbeddings
 from tests.unit_tests.fixtures.filtering_test_cases import (
@@ -106,6 +110,268 @@ async def test_async_pgvector_embeddings() -> None:
     assert output == [Document(page_content="foo", id=AnyStr())]
 
 
+def test_pgvector_add_embeddings_batched() -> None:
+    """Test adding embeddings across several insert batches."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    docsearch = PGVector.from_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    embeddings = FakeEmbeddingsWithAdaDimension().embed_documents(texts)
+    docsearch.add_embeddings(texts, embeddings, ids=ids, batch_size=2)
+    output = docsearch.get_by_ids(ids)
+    assert sorted(doc.page_content for doc in output) == sorted(texts)
+
+
+def test_pgvector_add_embeddings_numpy() -> None:
+    """Test adding embeddings given as a numpy matrix."""
+    texts = ["foo", "bar", "baz"]
+    docsearch = PGVector.from_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    embeddings = np.array(
+        FakeEmbeddingsWithAdaDimension().embed_documents(texts), dtype=np.float32
+    )
+    docsearch.add_embeddings(texts, embeddings)
+    output = docsearch.similarity_search("foo", k=1)
+    assert output == [Document(page_content="foo", id=AnyStr())]
+
+
+def test_vector_to_db_round_trips_float32() -> None:
+    """Test vectors are bound as the float32 values pgvector stores."""
+    vector = np.random.default_rng(0).standard_normal(1536)
+    text = _vector_to_db(vector, 1536)
+    assert text is not None
+    parsed = np.array(text[1:-1].split(","), dtype=np.float32)
+    assert np.array_equal(parsed, vector.astype(np.float32))
+    assert _vector_to_db(None) is None
+    with pytest.raises(ValueError):
+        _vector_to_db([1.0, 2.0], 3)
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_add_embeddings_batched() -> None:
+    """Test adding embeddings across several insert batches."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    docsearch = await PGVector.afrom_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    embeddings = FakeEmbeddingsWithAdaDimension().embed_documents(texts)
+    await docsearch.aadd_embeddings(texts, embeddings, ids=ids, batch_size=2)
+    output = await docsearch.aget_by_ids(ids)
+    assert sorted(doc.page_content for doc in output) == sorted(texts)
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_add_embeddings_concurrent() -> None:
+    """Test writing insert batches concurrently."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    docsearch = await PGVector.afrom_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    embeddings = FakeEmbeddingsWithAdaDimension().embed_documents(texts)
+    await docsearch.aadd_embeddings(
+        texts, embeddings, ids=ids, batch_size=2, max_concurrency=3
+    )
+    output = await docsearch.aget_by_ids(ids)
+    assert sorted(doc.page_content for doc in output) == sorted(texts)
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_add_embeddings_concurrent_failure() -> None:
+    """Test a failing batch is raised after the other batches are committed."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    docsearch = await PGVector.afrom_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    embeddings = FakeEmbeddingsWithAdaDimension().embed_documents(texts)
+    # The wrong number of dimensions makes the batch holding "baz" fail.
+    embeddings[2] = [1.0]
+    with pytest.raises(StatementError):
+        await docsearch.aadd_embeddings(
+            texts, embeddings, ids=ids, batch_size=1, max_concurrency=2
+        )
+    output = await docsearch.aget_by_ids(ids)
+    assert sorted(doc.page_content for doc in output) == ["bar", "foo", "quux", "qux"]
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_add_embeddings_coalesced(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test coalescing concurrent adds into shared upserts."""
+    texts = ["foo", "bar", "baz", "corge", "qux", "quux"]
+    ids = ["0", "1", "2", "0", "3", "4"]
+    docsearch = await PGVector.afrom_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    batches: List[List[str]] = []
+    upsert_rows = docsearch._aupsert_rows
+
+    async def _recording_upsert_rows(rows: Sequence[Any], batch_size: int) -> None:
+        batches.append([row[3] for row in rows])
+        await upsert_rows(rows, batch_size)
+
+    monkeypatch.setattr(docsearch, "_aupsert_rows", _recording_upsert_rows)
+    embeddings = FakeEmbeddingsWithAdaDimension().embed_documents(texts)
+
+    docsearch.enable_coalescing(max_batch=10, max_delay_ms=50)
+    await asyncio.gather(
+        *(
+            docsearch.aadd_embeddings([text], [embedding], ids=[id])
+            for text, embedding, id in zip(texts, embeddings, ids)
+        )
+    )
+    await docsearch.adisable_coalescing()
+    # The repeated id starts a new batch, so the later text wins.
+    assert batches == [["0", "1", "2"], ["0", "3", "4"]]
+
+    # Without a delay, calls already queued are still written together.
+    batches.clear()
+    docsearch.enable_coalescing(max_batch=10, max_delay_ms=0)
+    await asyncio.gather(
+        *(
+            docsearch.aadd_embeddings([text], [embedding], ids=[id])
+            for text, embedding, id in zip(texts[:3], embeddings, ["5", "6", "7"])
+        )
+    )
+    await docsearch.adisable_coalescing()
+    assert batches == [["5", "6", "7"]]
+
+    output = await docsearch.aget_by_ids(ids[:3] + ids[4:])
+    assert sorted(doc.page_content for doc in output) == [
+        "bar",
+        "baz",
+        "corge",
+        "quux",
+        "qux",
+    ]
+
+
+def test_pgvector_lazy_get_by_ids() -> None:
+    """Test lazily getting documents by ids across several batches."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    docsearch = PGVector.from_texts(
+        texts=texts,
+        ids=ids,
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    output = list(docsearch.lazy_get_by_ids(ids + ["missing"], batch_size=2))
+    assert sorted(str(doc.id) for doc in output) == sorted(ids)
+
+
+def test_pgvector_get_by_ids_missing_collection() -> None:
+    """Test getting documents after the collection was deleted."""
+    docsearch = PGVector.from_texts(
+        texts=["foo"],
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    docsearch.delete_collection()
+    with pytest.raises(ValueError, match="Collection not found"):
+        docsearch.get_by_ids(["1"])
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_lazy_get_by_ids() -> None:
+    """Test lazily getting documents by ids across several batches."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    docsearch = await PGVector.afrom_texts(
+        texts=texts,
+        ids=ids,
+        collection_name="test_collection",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    output = [
+        doc async for doc in docsearch.alazy_get_by_ids(ids + ["missing"], batch_size=2)
+    ]
+    assert sorted(str(doc.id) for doc in output) == sorted(ids)
+
+
+class CountingEmbeddings(FakeEmbeddingsWithAdaDimension):
+    """Fake embeddings that record the texts they embed."""
+
+    def __init__(self) -> None:
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_pgvector_reuse_embeddings() -> None:
+    """Test that unchanged documents are not embedded again."""
+    embeddings = CountingEmbeddings()
+    docsearch = PGVector.from_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=embeddings,
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+        reuse_embeddings=True,
+    )
+    docsearch.add_texts(["foo", "bar"], ids=["1", "2"])
+    docsearch.add_texts(["foo", "baz", "qux"], ids=["1", "2", "3"])
+    assert embeddings.embedded == ["foo", "bar", "baz", "qux"]
+    output = docsearch.get_by_ids(["1", "2", "3"])
+    assert sorted(doc.page_content for doc in output) == ["baz", "foo", "qux"]
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_reuse_embeddings() -> None:
+    """Test that unchanged documents are not embedded again."""
+    embeddings = CountingEmbeddings()
+    docsearch = await PGVector.afrom_texts(
+        texts=[],
+        collection_name="test_collection",
+        embedding=embeddings,
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+        reuse_embeddings=True,
+    )
+    await docsearch.aadd_texts(["foo", "bar"], ids=["1", "2"])
+    await docsearch.aadd_texts(["foo", "baz", "qux"], ids=["1", "2", "3"])
+    assert embeddings.embedded == ["foo", "bar", "baz", "qux"]
+    output = await docsearch.aget_by_ids(["1", "2", "3"])
+    assert sorted(doc.page_content for doc in output) == ["baz", "foo", "qux"]
+
+
 def test_pgvector_with_metadatas() -> None:
     """Test end to end construction and search."""
     texts = ["foo", "bar", "baz"]
@@ -361,6 +627,22 @@ def test_pgvector_delete_docs() -> None:
         assert sorted(record.id for record in records) == []  # type: ignore
 
 
+def test_pgvector_delete_no_ids() -> None:
+    """Deleting without ids is a no-op."""
+    texts = ["foo", "bar", "baz"]
+    vectorstore = PGVector.from_texts(
+        texts=texts,
+        collection_name="test_collection_filter",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        ids=["1", "2", "3"],
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    vectorstore.delete()
+    vectorstore.delete([])
+    assert len(vectorstore.get_by_ids(["1", "2", "3"])) == 3
+
+
 def test_pgvector_delete_collection() -> None:
     """Add and delete documents."""
     texts = ["foo", "bar", "baz"]
@@ -410,6 +692,53 @@ async def test_async_pgvector_delete_docs() -> None:
         assert sorted(record.id for record in records) == []  # type: ignore
 
 
+@pytest.mark.asyncio
+async def test_async_pgvector_delete_docs_concurrent() -> None:
+    """Delete documents in concurrent batches."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    vectorstore = await PGVector.afrom_texts(
+        texts=texts,
+        collection_name="test_collection_filter",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        ids=ids,
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    await vectorstore.adelete(ids[:4], batch_size=1, max_concurrency=2)
+    output = await vectorstore.aget_by_ids(ids)
+    assert [doc.id for doc in output] == ["4"]
+
+
+@pytest.mark.asyncio
+async def test_async_pgvector_delete_docs_concurrent_failure(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test a failing batch is raised after the other batches are deleted."""
+    texts = ["foo", "bar", "baz", "qux", "quux"]
+    ids = [str(i) for i in range(len(texts))]
+    vectorstore = await PGVector.afrom_texts(
+        texts=texts,
+        collection_name="test_collection_filter",
+        embedding=FakeEmbeddingsWithAdaDimension(),
+        ids=ids,
+        connection=CONNECTION_STRING,
+        pre_delete_collection=True,
+    )
+    delete_stmt = vectorstore._delete_stmt
+
+    def _failing_delete_stmt(batch: Sequence[str], collection_id: Any = None) -> Any:
+        if "2" in batch:
+            return text("SELECT 1 / 0")
+        return delete_stmt(batch, collection_id)
+
+    monkeypatch.setattr(vectorstore, "_delete_stmt", _failing_delete_stmt)
+    with pytest.raises(StatementError):
+        await vectorstore.adelete(ids[:4], batch_size=1, max_concurrency=2)
+    output = await vectorstore.aget_by_ids(ids)
+    assert sorted(str(doc.id) for doc in output) == ["2", "4"]
+
+
 def test_pgvector_index_documents() -> None:
     """Test adding duplicate documents results in overwrites."""
     documents = [